@@ -2,30 +2,54 @@
 Agent - Processes user queries to fetch plan information from a database and API.
 """
 
+import asyncio
+import functools
+import logging
 import os
+import re
 import sys
-from typing import Dict, List, Optional, Any, TypedDict, Annotated, Literal, Tuple
+import threading
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Any,
+    TypedDict,
+    Annotated,
+    Literal,
+    Tuple,
+    Iterator,
+    Union,
+)
 import json
 from operator import itemgetter
 from dotenv import load_dotenv
 
+import httpx
+
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 
 import langgraph
+from langgraph.constants import Send
 from langgraph.graph import END, StateGraph
 
+import cache
+import plan_index
 from tools.database_query_tool import DatabaseQueryTool
-from tools.api_tool import ApiTool
+from tools.api_tool import AsyncApiTool, category_endpoint, plan_endpoint
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Initialize the tools
 db_tool = DatabaseQueryTool()
-api_tool = ApiTool(os.getenv("API_BASE_URL", "http://35.182.5.113:8080"))
+api_base_url = os.getenv("API_BASE_URL", "http://35.182.5.113:8080")
+async_api_tool = AsyncApiTool(api_base_url)
 
 # Set up the LLM
 anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
@@ -36,51 +60,66 @@ llm = ChatAnthropic(
     api_key=anthropic_api_key,
     model=os.getenv("ANTHROPIC_MODEL", "claude-3-7-sonnet-20250219"),
     temperature=0.1,
+    default_headers={"anthropic-beta": "prompt-caching-2024-07-31"},
 )
 
+# Share HTTP/2 keep-alive connections across every LLM call and turn instead of
+# letting each Anthropic client manage its own HTTP/1.1 pool. ChatAnthropic is a
+# pydantic model without fields for its clients, so normal assignment is rejected.
+llm_http_limits = httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60)
+object.__setattr__(
+    llm,
+    "_client",
+    llm._client.with_options(
+        http_client=httpx.Client(http2=True, limits=llm_http_limits, timeout=30.0)
+    ),
+)
+object.__setattr__(
+    llm,
+    "_async_client",
+    llm._async_client.with_options(
+        http_client=httpx.AsyncClient(
+            http2=True, limits=llm_http_limits, timeout=30.0
+        )
+    ),
+)
 
-# Define the state for our agent
-class AgentState(TypedDict):
-    """State object for the agent."""
+# All async work runs on one long-lived event loop, so pooled connections of the
+# async HTTP clients stay usable from one query to the next
+event_loop = asyncio.new_event_loop()
+threading.Thread(target=event_loop.run_forever, daemon=True).start()
 
-    messages: List[Dict]
-    user_query: str
-    sql_query: Optional[str]
-    query_type: Optional[str]  # 'category' or 'plan'
-    db_result: Optional[Dict]
-    api_result: Optional[Dict]
-    response: Optional[str]
-    context: Optional[str]  # Added to track conversation context
 
+def run_sync(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, event_loop).result()
 
-# Define the nodes
-def parse_user_input(state: AgentState) -> AgentState:
-    """Parse user input into SQL query for either category or specific plan information."""
-    messages = state["messages"]
-    user_query = state["user_query"]
 
-    print("\n" + "=" * 80)
-    print(f"🔍 Processing user query: '{user_query}'")
+# Background tasks are referenced here until done so they are not collected
+background_tasks = set()
 
-    # Build context from previous messages
-    context = ""
-    if len(messages) > 0:
-        context_pairs = []
-        for i in range(0, len(messages), 2):
-            if i + 1 < len(messages):  # Make sure there's a response for this query
-                user_msg = messages[i]["content"]
-                assistant_msg = messages[i + 1]["content"]
-                context_pairs.append(f"User: {user_msg}\nAssistant: {assistant_msg}")
-
-        if context_pairs:
-            context = "Previous conversation:\n" + "\n\n".join(context_pairs)
-            print(
-                f"📝 Using conversation context from {len(context_pairs)} exchange(s)"
-            )
 
-    # Create messages directly instead of using ChatPromptTemplate
-    system_message = SystemMessage(
-        content="""You are an expert at converting natural language into SQL queries. 
+def warm_up_db() -> None:
+    """Start creating the database connection pool without waiting for it.
+
+    A warm-up failure is only logged; call_db reports it when it connects.
+    """
+    if db_tool.pool is not None:
+        return
+
+    def done(task: asyncio.Task) -> None:
+        background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("Database warm-up failed: %s", task.exception())
+
+    task = asyncio.create_task(db_tool.aprepare())
+    background_tasks.add(task)
+    task.add_done_callback(done)
+
+
+# System prompts are kept at module scope so their bytes are identical on every
+# turn, which is required for Anthropic prompt caching to reuse the prefix.
+SQL_SYSTEM_PROMPT = """You are an expert at converting natural language into SQL queries. 
     The database contains a table called 'plans' with the following columns:
     - id
     - Category (e.g., 'Business Internet', 'Business Mobile', 'Business TV')
@@ -109,19 +148,311 @@ def parse_user_input(state: AgentState) -> AgentState:
     use that context to generate an appropriate SQL query.
     
     DO NOT explain your reasoning. ONLY return the SQL query."""
+
+RESPONSE_SYSTEM_PROMPT = """You are a helpful customer service assistant. 
+    Your task is to provide information about plans based on the data provided.
+    
+    Generate a natural, conversational response to the user's query using the 
+    database and API results. Be helpful and informative.
+    
+    If there were errors in retrieving the data, apologize and explain what went wrong 
+    in user-friendly terms without technical details.
+    
+    Maintain conversation context and refer to previous information when appropriate.
+    If the user is asking about something you've already discussed, acknowledge that.
+    
+    Make your responses concise and focused on answering the user's question."""
+
+
+def cached_system_message(prompt: str) -> SystemMessage:
+    """Wrap a static system prompt in a content block marked for prompt caching."""
+    return SystemMessage(
+        content=[
+            {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}
+        ]
+    )
+
+
+SQL_SYSTEM_MESSAGE = cached_system_message(SQL_SYSTEM_PROMPT)
+RESPONSE_SYSTEM_MESSAGE = cached_system_message(RESPONSE_SYSTEM_PROMPT)
+
+
+# Conversation history packing. The window start only moves in steps of
+# HISTORY_TURNS // 2 exchanges, so the history prefix stays byte-identical
+# across several turns and keeps hitting the prompt cache.
+HISTORY_TURNS = 6
+HISTORY_CHAR_BUDGET = 24000
+
+
+def pack_history(messages: List[Dict]) -> List[str]:
+    """Return the recent user/assistant exchanges to send as the history prefix.
+
+    Only the exchanges inside the window are formatted, so the cost per turn
+    is bounded by HISTORY_TURNS rather than growing with the conversation.
+    """
+    count = len(messages) // 2
+    step = HISTORY_TURNS // 2
+    start = -(-max(0, count - HISTORY_TURNS) // step) * step
+
+    exchanges = [
+        f"User: {messages[2 * i]['content']}\nAssistant: {messages[2 * i + 1]['content']}"
+        for i in range(start, count)
+    ]
+
+    # Drop whole steps from the front until the window fits the budget, but
+    # never a step that would empty it; then drop single exchanges so the most
+    # recent exchange that fits is still sent
+    size = sum(len(e) for e in exchanges)
+    dropped = 0
+    while size > HISTORY_CHAR_BUDGET and dropped + step < len(exchanges):
+        size -= sum(len(e) for e in exchanges[dropped : dropped + step])
+        dropped += step
+    while size > HISTORY_CHAR_BUDGET and dropped < len(exchanges):
+        size -= len(exchanges[dropped])
+        dropped += 1
+
+    return exchanges[dropped:]
+
+
+def build_human_message(history: List[str], current_turn: str) -> HumanMessage:
+    """Put the cacheable history blocks first and the volatile current turn last."""
+    if not history:
+        return HumanMessage(content=current_turn)
+
+    blocks = [{"type": "text", "text": "Previous conversation:"}]
+    blocks += [{"type": "text", "text": exchange} for exchange in history]
+    blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    blocks.append({"type": "text", "text": current_turn})
+    return HumanMessage(content=blocks)
+
+
+# Rule-based classification for common queries. A query matching exactly one
+# rule is answered with the rule's templated SQL, skipping the LLM round-trip;
+# anything ambiguous or unmatched falls back to LLM SQL generation.
+QUERY_RULES = [
+    (
+        re.compile(r"\bmobile\s+plans?\b", re.I),
+        "category",
+        "SELECT DISTINCT Category FROM plans WHERE Category LIKE %s",
+        ("%Mobile%",),
+    ),
+    (
+        re.compile(r"\binternet\s+plans?\b", re.I),
+        "category",
+        "SELECT DISTINCT Category FROM plans WHERE Category LIKE %s",
+        ("%Internet%",),
+    ),
+    (
+        re.compile(r"\btv\s+plans?\b", re.I),
+        "category",
+        "SELECT DISTINCT Category FROM plans WHERE Category LIKE %s",
+        ("%TV%",),
+    ),
+    (
+        re.compile(r"\b5g\b", re.I),
+        "plan",
+        "SELECT Plans FROM plans WHERE Plans LIKE %s",
+        ("%5G%",),
+    ),
+    (
+        re.compile(r"\bgigabit\b", re.I),
+        "plan",
+        "SELECT Plans FROM plans WHERE Plans LIKE %s",
+        ("%Gigabit%",),
+    ),
+]
+
+
+def classify(query: str) -> Optional[Tuple[str, str, Tuple]]:
+    """Return (query_type, sql_query, sql_params) if exactly one rule matches."""
+    matches = [
+        (query_type, sql, params)
+        for pattern, query_type, sql, params in QUERY_RULES
+        if pattern.search(query)
+    ]
+    if len(matches) == 1:
+        return matches[0]
+    return None
+
+
+def matches_plan_rule(query: str) -> bool:
+    """Return True if any plan rule matches, even when classify() is ambiguous."""
+    return any(
+        query_type == "plan" and pattern.search(query)
+        for pattern, query_type, _, _ in QUERY_RULES
+    )
+
+
+# Extra words users say for a category, keyed by a word of the category name
+CATEGORY_SYNONYMS = {
+    "mobile": ["cell", "cellular", "wireless"],
+    "internet": ["broadband", "wifi"],
+    "tv": ["television"],
+}
+
+
+@functools.lru_cache(maxsize=1)
+def category_matcher() -> Tuple["re.Pattern", Dict[str, frozenset]]:
+    """Compile a regex over the synonyms of every known category.
+
+    The closed set of categories is read from the database once; a failed
+    read raises, so it is retried on the next call instead of being cached.
+    """
+    result = db_tool.execute_query("SELECT DISTINCT Category FROM plans")
+    if not result.get("success", False):
+        raise ConnectionError(result.get("message", "Unknown error"))
+
+    synonyms: Dict[str, set] = {}
+    for category in frozenset(row["Category"] for row in result["results"]):
+        words = [w for w in category.lower().split() if w != "business"]
+        extra = [syn for w in words for syn in CATEGORY_SYNONYMS.get(w, [])]
+        for synonym in [category.lower()] + words + extra:
+            synonyms.setdefault(synonym, set()).add(category)
+
+    pattern = re.compile(
+        r"\b("
+        + "|".join(map(re.escape, sorted(synonyms, key=len, reverse=True)))
+        + r")\b",
+        re.I,
+    )
+    return pattern, {k: frozenset(v) for k, v in synonyms.items()}
+
+
+def match_categories(query: str) -> List[str]:
+    """Return the known categories a query names, or [] if none or unavailable."""
+    try:
+        pattern, synonyms = category_matcher()
+    except Exception as e:
+        print(f"⚠️ Category list unavailable: {str(e)}")
+        return []
+
+    categories = set()
+    for synonym in pattern.findall(query):
+        categories |= synonyms[synonym.lower()]
+    return sorted(categories)
+
+
+def load_plan_catalog() -> List[Dict]:
+    """Fetch every plan row for the plan index."""
+    result = db_tool.execute_query(
+        "SELECT Category, Plans, Description FROM plans"
     )
+    if not result.get("success", False):
+        raise ConnectionError(
+            f"Failed to load the plan catalog: {result.get('message', 'Unknown error')}"
+        )
+    return result.get("results", [])
+
+
+def merge_dicts(left: Optional[Dict], right: Optional[Dict]) -> Dict:
+    """Reducer that merges per-item results written by parallel nodes."""
+    return {**(left or {}), **(right or {})}
+
+
+# Define the state for our agent
+class AgentState(TypedDict):
+    """State object for the agent."""
+
+    messages: List[Dict]
+    user_query: str
+    sql_query: Optional[str]
+    sql_params: Optional[Tuple]  # Values bound to the sql_query placeholders
+    query_type: Optional[str]  # 'category' or 'plan'
+    db_result: Optional[Dict]
+    api_result: Optional[Dict]
+    response: Optional[str]
+    context: Optional[List[str]]  # Packed previous exchanges sent as history
+    api_partial: Annotated[Dict, merge_dicts]  # Per-item API results from fetch_one
+    api_batch: Optional[List[str]]  # Names served by the plans/batch call
+
+
+# Define the nodes
+async def parse_user_input(state: AgentState) -> AgentState:
+    """Parse user input into SQL query for either category or specific plan information."""
+    messages = state["messages"]
+    user_query = state["user_query"]
+
+    print("\n" + "=" * 80)
+    print(f"🔍 Processing user query: '{user_query}'")
+
+    # Build context from previous messages
+    context = pack_history(messages)
+    if context:
+        print(f"📝 Using conversation context from {len(context)} exchange(s)")
+
+    # Skip the LLM when a rule classifies the query unambiguously
+    classified = classify(user_query)
+
+    # Known categories, or their synonyms such as "broadband", skip both the
+    # LLM and the database unless the query asks about specific plans
+    categories = (
+        []
+        if matches_plan_rule(user_query)
+        else await asyncio.to_thread(match_categories, user_query)
+    )
+    if categories:
+        print(f"⚡ Matched known categories: {categories}")
+        print("📋 Query type: category")
+        return {
+            **state,
+            "sql_query": None,
+            "query_type": "category",
+            "db_result": {
+                "success": True,
+                "results": [{"Category": category} for category in categories],
+                "row_count": len(categories),
+                "message": f"Matched {len(categories)} known categories.",
+            },
+            "context": context,
+        }
+
+    if classified:
+        query_type, sql_query, sql_params = classified
+        print(f"⚡ Rule-based SQL query: {sql_query} {sql_params}")
+        print(f"📋 Query type: {query_type}")
+        return {
+            **state,
+            "sql_query": sql_query,
+            "sql_params": sql_params,
+            "query_type": query_type,
+            "context": context,
+        }
+
+    # Answer pure plan lookups straight from the embedded plan catalog
+    matched_plans = await asyncio.to_thread(
+        plan_index.search, user_query, load_plan_catalog
+    )
+    if matched_plans:
+        print(f"⚡ Plan index matched {len(matched_plans)} plan(s)")
+        print("📋 Query type: plan")
+        return {
+            **state,
+            "sql_query": None,
+            "query_type": "plan",
+            "db_result": {
+                "success": True,
+                "results": matched_plans,
+                "row_count": len(matched_plans),
+                "message": f"Matched {len(matched_plans)} plans from the plan index.",
+            },
+            "context": context,
+        }
+
+    # Create messages directly instead of using ChatPromptTemplate
+    system_message = SQL_SYSTEM_MESSAGE
 
     # Include context in the human message if available
     if context:
-        human_content = f"{context}\n\nCurrent user query: {user_query}"
+        human_content = f"Current user query: {user_query}"
     else:
         human_content = user_query
 
-    human_message = HumanMessage(content=human_content)
+    human_message = build_human_message(context, human_content)
 
     print("📝 Generating SQL query...")
-    # Invoke the LLM with the messages
-    query_response = llm.invoke([system_message, human_message])
+    # Warm up the database connection while the LLM generates the query
+    warm_up_db()
+    query_response = await llm.ainvoke([system_message, human_message])
 
     # Extract the SQL query from the response
     sql_query = query_response.content.strip()
@@ -144,159 +475,240 @@ def parse_user_input(state: AgentState) -> AgentState:
     }
 
 
-def call_db(state: AgentState) -> AgentState:
+def route_after_parse(state: AgentState) -> Union[str, List[Send]]:
+    """Skip the database when parse_user_input already produced the rows."""
+    if state.get("db_result") is not None:
+        return dispatch_api(state)
+    return "call_db"
+
+
+def result_names(query_type: str, db_result: Dict) -> List[str]:
+    """Extract the category or plan names to look up from the DB result."""
+    column = "Category" if query_type == "category" else "Plans"
+    names = (row.get(column) for row in db_result.get("results", []))
+    return [name for name in names if name is not None]
+
+
+def api_skip_result(query_type: str, db_result: Dict) -> Optional[Dict]:
+    """Return the api_result to use when there is nothing to fetch, else None."""
+    # If DB query failed, skip API call
+    if not db_result.get("success", False):
+        print("❌ Database query failed, skipping API calls")
+        return {
+            "error": "Database query failed",
+            "details": db_result.get("message", "Unknown error"),
+        }
+
+    # If no categories/plans found, skip API call
+    if not result_names(query_type, db_result):
+        label = "categories" if query_type == "category" else "plans"
+        print(f"⚠️ No {label} found in database response")
+        return {
+            "error": f"No {label} found",
+            "details": f"The database query did not return any {label}",
+        }
+
+    return None
+
+
+async def call_db(state: AgentState) -> AgentState:
     """Execute the SQL query using the database tool."""
     sql_query = state["sql_query"]
 
     print("🔄 Executing SQL query...")
-    db_response = json.loads(db_tool(sql_query))
-    print(f"📊 Database response: {json.dumps(db_response, indent=2)}")
+    db_response = await db_tool.aquery(sql_query, state.get("sql_params"))
+    print(f"📊 Database response: {db_response.get('message')}")
+    logger.debug("Database response: %s", db_response)
+
+    return {
+        **state,
+        "db_result": db_response,
+        "api_result": api_skip_result(state["query_type"], db_response),
+    }
 
-    return {**state, "db_result": db_response}
 
+def api_endpoint(kind: str, name: str) -> str:
+    """Return the API endpoint for a category or plan name."""
+    if kind == "category":
+        return category_endpoint(name)
+    return plan_endpoint(name)
+
+
+def fan_out(query_type: str, names: List[str]) -> List[Send]:
+    """Send one fetch_one task per category/plan name."""
+    return [
+        Send("fetch_one", {"item": name, "query_type": query_type}) for name in names
+    ]
+
+
+def dispatch_api(state: AgentState) -> Union[str, List[Send]]:
+    """Fetch the categories/plans in one batch call, or skip the API phase."""
+    # call_db already recorded why there is nothing to fetch
+    if state.get("api_result") is not None:
+        return "skip"
 
-def call_api(state: AgentState) -> AgentState:
-    """Call the API with results from database."""
-    db_result = state["db_result"]
     query_type = state["query_type"]
+    names = list(dict.fromkeys(result_names(query_type, state["db_result"])))
+    label = "categories" if query_type == "category" else "plans"
 
     print("\n" + "-" * 80)
     print("🌐 Starting API calls...")
+    print(f"📋 Found {label}: {names}")
+
+    # The server does not expose plans/batch, call the API once per item
+    if async_api_tool.batch_supported is False:
+        return fan_out(query_type, names)
+    return "fetch_batch"
+
+
+async def fetch_batch(state: AgentState) -> Dict:
+    """Call the API once for every category/plan via the batch endpoint."""
+    query_type = state["query_type"]
+    names = list(dict.fromkeys(result_names(query_type, state["db_result"])))
+    label = "categories" if query_type == "category" else "plans"
+
+    print(f"📲 Calling batch API for {len(names)} {label}")
+    print("   Endpoint: plans/batch")
+    print("   Method: POST")
+    response = await async_api_tool.send_batch(**{label: names})
+    logger.debug("Batch API response: %s", response)
+
+    if "error" in response:
+        print(f"⚠️ Batch API call failed, calling the API per item: {response}")
+        return {"api_batch": []}
+
+    found = {name: response[name] for name in names if name in response}
+    return {"api_partial": found, "api_batch": list(found)}
+
+
+def route_after_batch(state: AgentState) -> Union[str, List[Send]]:
+    """Fan out per-item calls for anything the batch call did not return."""
+    query_type = state["query_type"]
+    partial = state.get("api_partial") or {}
+    names = result_names(query_type, state["db_result"])
+    missing = [name for name in dict.fromkeys(names) if name not in partial]
+    if not missing:
+        return "aggregate_api"
+    return fan_out(query_type, missing)
+
+
+async def fetch_one(task: Dict) -> Dict:
+    """Call the API for a single category or plan."""
+    name = task["item"]
+    kind = task["query_type"]
+    endpoint = api_endpoint(kind, name)
+
+    print(f"📲 Calling API for {kind}: '{name}'")
+    print(f"   Endpoint: {endpoint}")
+    print("   Method: GET")
+    response = await async_api_tool.send_request(endpoint=endpoint, method="GET")
+    logger.debug("API response for %s '%s': %s", kind, name, response)
+
+    return {"api_partial": {name: response}}
 
-    # If DB query failed, skip API call
-    if not db_result.get("success", False):
-        print("❌ Database query failed, skipping API calls")
-        return {
-            **state,
-            "api_result": {
-                "error": "Database query failed",
-                "details": db_result.get("message", "Unknown error"),
-            },
-        }
 
-    api_results = {}
-
-    if query_type == "category":
-        # Extract categories from the DB result
-        categories = [row.get("Category") for row in db_result.get("results", [])]
-        print(f"📋 Found categories: {categories}")
-
-        # If no categories found, skip API call
-        if not categories:
-            print("⚠️ No categories found in database response")
-            return {
-                **state,
-                "api_result": {
-                    "error": "No categories found",
-                    "details": "The database query did not return any categories",
-                },
-            }
-
-        # Make API calls for each category
-        for category in categories:
-            print(f"📲 Calling API for category: '{category}'")
-
-            # Format the endpoint correctly using the category
-            endpoint = f"plans/category/{category}"
-            method = "GET"
-
-            print(f"   Endpoint: {endpoint}")
-            print(f"   Method: {method}")
-
-            # Call API to get plans for this category
-            response = api_tool.send_request(endpoint=endpoint, method=method)
-
-            print(f"   Response: {json.dumps(response, indent=2)}")
-            api_results[category] = response
-
-    elif query_type == "plan":
-        # Extract plan names from the DB result
-        plans = [row.get("Plans") for row in db_result.get("results", [])]
-        print(f"📋 Found plans: {plans}")
-
-        # If no plans found, skip API call
-        if not plans:
-            print("⚠️ No plans found in database response")
-            return {
-                **state,
-                "api_result": {
-                    "error": "No plans found",
-                    "details": "The database query did not return any plans",
-                },
-            }
-
-        # Make API calls for each plan
-        for plan in plans:
-            print(f"📲 Calling API for plan: '{plan}'")
-
-            # Format the endpoint correctly using the plan name
-            endpoint = f"plans/{plan}"
-            method = "GET"
-
-            print(f"   Endpoint: {endpoint}")
-            print(f"   Method: {method}")
-
-            # Call API to get details for this plan
-            response = api_tool.send_request(endpoint=endpoint, method=method)
-
-            print(f"   Response: {json.dumps(response, indent=2)}")
-            api_results[plan] = response
+def aggregate_api(state: AgentState) -> AgentState:
+    """Collect the per-item API results in database order."""
+    partial = state.get("api_partial") or {}
+    names = result_names(state["query_type"], state["db_result"])
+    api_results = {name: partial[name] for name in names if name in partial}
 
     return {**state, "api_result": api_results}
 
 
-def generate_response(state: AgentState) -> AgentState:
-    """Generate a natural language response based on DB and API results."""
+# Only these fields of a plan record are sent to the LLM for the response
+PLAN_FIELDS = {
+    "name",
+    "plan",
+    "plans",
+    "plan_name",
+    "category",
+    "price",
+    "description",
+    "features",
+    "key_features",
+}
+MAX_RESULT_CHARS = 8192
+
+
+def drop_nulls(value: Any) -> Any:
+    """Recursively remove None values and empty containers."""
+    if isinstance(value, dict):
+        cleaned = {k: drop_nulls(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in (None, {}, [])}
+    if isinstance(value, list):
+        return [drop_nulls(v) for v in value if v is not None]
+    return value
+
+
+def slim_record(record: Any) -> Any:
+    """Project a plan record to the fields the response needs."""
+    if isinstance(record, list):
+        return [slim_record(r) for r in record]
+    if not isinstance(record, dict):
+        return record
+    slim = {k: v for k, v in record.items() if k.lower() in PLAN_FIELDS}
+    return drop_nulls(slim or record)
+
+
+def slim_db_result(db_result: Optional[Dict]) -> Dict:
+    """Keep only the rows (or the error) of a database result."""
+    if not db_result or not db_result.get("success", False):
+        return {"error": (db_result or {}).get("message", "Unknown error")}
+    return {"results": drop_nulls(db_result.get("results", []))}
+
+
+def slim_api_result(api_result: Optional[Dict]) -> Dict:
+    """Keep only the plan fields of each API response."""
+    if not api_result or "error" in api_result:
+        return drop_nulls(api_result or {})
+    return {name: slim_record(payload) for name, payload in api_result.items()}
+
+
+def compact_json(value: Any) -> str:
+    """Serialize without whitespace, truncating to MAX_RESULT_CHARS."""
+    text = json.dumps(value, default=str, separators=(",", ":"))
+    if len(text) > MAX_RESULT_CHARS:
+        text = text[:MAX_RESULT_CHARS] + "... (truncated)"
+    return text
+
+
+def build_response_messages(state: AgentState) -> List:
+    """Build the LLM messages for the natural language response."""
     user_query = state["user_query"]
     db_result = state["db_result"]
     api_result = state["api_result"]
     query_type = state["query_type"]
-    context = state.get("context", "")
-
-    print("\n" + "-" * 80)
-    print("💬 Generating natural language response...")
+    context = state.get("context") or []
 
     # Create messages directly
-    system_message = SystemMessage(
-        content="""You are a helpful customer service assistant. 
-    Your task is to provide information about plans based on the data provided.
-    
-    Generate a natural, conversational response to the user's query using the 
-    database and API results. Be helpful and informative.
-    
-    If there were errors in retrieving the data, apologize and explain what went wrong 
-    in user-friendly terms without technical details.
-    
-    Maintain conversation context and refer to previous information when appropriate.
-    If the user is asking about something you've already discussed, acknowledge that.
-    
-    Make your responses concise and focused on answering the user's question."""
-    )
+    system_message = RESPONSE_SYSTEM_MESSAGE
 
-    # Include context in the human message if available
+    # Only the current turn goes after the cached history prefix
     human_content = f"""
     User Query: {user_query}
     
     Query Type: {query_type}
     
-    Database Result: {json.dumps(db_result, indent=2)}
+    Database Result: {compact_json(slim_db_result(db_result))}
     
-    API Result: {json.dumps(api_result, indent=2)}
+    API Result: {compact_json(slim_api_result(api_result))}
     """
 
-    if context:
-        human_content = f"""
-        {context}
-        
-        {human_content}
-        """
-
     human_content += "\nPlease provide a natural language response to the user's query."
 
-    human_message = HumanMessage(content=human_content)
+    human_message = build_human_message(context, human_content)
+
+    return [system_message, human_message]
+
+
+async def generate_response(state: AgentState) -> AgentState:
+    """Generate a natural language response based on DB and API results."""
+    print("\n" + "-" * 80)
+    print("💬 Generating natural language response...")
 
     # Invoke the LLM with the messages
-    response = llm.invoke([system_message, human_message])
+    response = await llm.ainvoke(build_response_messages(state))
     print(f"✅ Response generated: {response.content}")
     print("=" * 80 + "\n")
 
@@ -308,22 +720,60 @@ def generate_response(state: AgentState) -> AgentState:
     }
 
 
+def stream_response(state: AgentState) -> Iterator[str]:
+    """Stream the natural language response for a state with DB and API results."""
+    print("\n" + "-" * 80)
+    print("💬 Streaming natural language response...")
+
+    final_text = ""
+    for chunk in llm.stream(build_response_messages(state)):
+        final_text += chunk.content
+        yield chunk.content
+
+    print(f"✅ Response generated: {final_text}")
+    print("=" * 80 + "\n")
+
+
 # Build the agent graph
-def build_agent_graph() -> StateGraph:
-    """Build the LangGraph agent workflow."""
+def build_agent_graph(include_response: bool = True) -> StateGraph:
+    """Build the LangGraph agent workflow.
+
+    With include_response=False the graph stops after the API calls so the
+    caller can stream the response itself.
+    """
     workflow = StateGraph(AgentState)
 
     # Add nodes
     workflow.add_node("parse_user_input", parse_user_input)
     workflow.add_node("call_db", call_db)
-    workflow.add_node("call_api", call_api)
-    workflow.add_node("generate_response", generate_response)
-
-    # Connect the nodes
-    workflow.add_edge("parse_user_input", "call_db")
-    workflow.add_edge("call_db", "call_api")
-    workflow.add_edge("call_api", "generate_response")
-    workflow.add_edge("generate_response", END)
+    workflow.add_node("fetch_batch", fetch_batch)
+    workflow.add_node("fetch_one", fetch_one)
+    workflow.add_node("aggregate_api", aggregate_api)
+    if include_response:
+        workflow.add_node("generate_response", generate_response)
+
+    # Connect the nodes; category/plan lookups go through one fetch_batch
+    # call, falling back to parallel fetch_one tasks via Send when the server
+    # has no batch endpoint, and fan back in at aggregate_api
+    next_node = "generate_response" if include_response else END
+    api_routes = {
+        "fetch_batch": "fetch_batch",
+        "fetch_one": "fetch_one",
+        "skip": next_node,
+    }
+    workflow.add_conditional_edges(
+        "parse_user_input", route_after_parse, {"call_db": "call_db", **api_routes}
+    )
+    workflow.add_conditional_edges("call_db", dispatch_api, api_routes)
+    workflow.add_conditional_edges(
+        "fetch_batch",
+        route_after_batch,
+        {"fetch_one": "fetch_one", "aggregate_api": "aggregate_api"},
+    )
+    workflow.add_edge("fetch_one", "aggregate_api")
+    workflow.add_edge("aggregate_api", next_node)
+    if include_response:
+        workflow.add_edge("generate_response", END)
 
     # Set the entry point
     workflow.set_entry_point("parse_user_input")
@@ -331,63 +781,141 @@ def build_agent_graph() -> StateGraph:
     return workflow
 
 
-# Create the agent for execution
-agent_executor = build_agent_graph().compile()
+@functools.lru_cache(maxsize=2)
+def get_agent_executor(include_response: bool = True):
+    """Compile the agent graph once and reuse it for every query."""
+    return build_agent_graph(include_response).compile()
 
 
-def process_user_query(query: str, chat_history: List[Dict] = None) -> str:
-    """Process a user query and return a response."""
-    if chat_history is None:
-        chat_history = []
+# Create the agent for execution
+agent_executor = get_agent_executor()
+
 
-    # Initialize the state
-    state = {
+def initial_state(query: str, chat_history: List[Dict]) -> AgentState:
+    """Build the initial agent state for a query."""
+    return {
         "messages": chat_history,
         "user_query": query,
         "sql_query": None,
+        "sql_params": None,
         "query_type": None,
         "db_result": None,
         "api_result": None,
         "response": None,
         "context": None,  # Add context field to state
+        "api_partial": {},
+        "api_batch": None,
     }
 
-    # Run the agent
-    result = agent_executor.invoke(state)
 
-    # Return the response
-    return result["response"]
+def extract_technical_details(result: AgentState) -> Dict:
+    """Extract the technical details shown alongside a response."""
+    technical_details = {
+        "sql_query": result.get("sql_query"),
+        "sql_params": result.get("sql_params"),
+        "query_type": result.get("query_type"),
+        "db_result": result.get("db_result"),
+        "api_result": result.get("api_result"),
+    }
 
+    # Reconstruct the API requests when the API phase succeeded
+    api_result = result.get("api_result") or {}
+    if "error" not in api_result:
+        batched = result.get("api_batch") or []
+        api_requests = []
+        if batched:
+            api_requests.append({"endpoint": "plans/batch", "method": "POST"})
+        api_requests += [
+            {"endpoint": api_endpoint(result.get("query_type"), name), "method": "GET"}
+            for name in api_result
+            if name not in batched
+        ]
+        technical_details["api_requests"] = api_requests
 
-def process_user_query_with_details(
+    return technical_details
+
+
+async def aprocess_user_query(query: str, chat_history: List[Dict] = None) -> str:
+    """Process a user query asynchronously and return a response."""
+    response, _ = await aprocess_user_query_with_details(query, chat_history)
+    return response
+
+
+def process_user_query(query: str, chat_history: List[Dict] = None) -> str:
+    """Process a user query and return a response."""
+    return run_sync(aprocess_user_query(query, chat_history))
+
+
+def is_cacheable(result: AgentState) -> bool:
+    """Return True if the response was built from successful DB and API results."""
+    db_result = result.get("db_result") or {}
+    api_result = result.get("api_result") or {}
+    if not db_result.get("success", False) or "error" in api_result:
+        return False
+    return not any(
+        isinstance(response, dict) and "error" in response
+        for response in api_result.values()
+    )
+
+
+async def aprocess_user_query_with_details(
     query: str, chat_history: List[Dict] = None
 ) -> Tuple[str, Dict]:
-    """Process a user query and return both response and technical details."""
+    """Process a user query asynchronously and return response and technical details."""
     if chat_history is None:
         chat_history = []
 
-    # Initialize the state
-    state = {
-        "messages": chat_history,
-        "user_query": query,
-        "sql_query": None,
-        "query_type": None,
-        "db_result": None,
-        "api_result": None,
-        "response": None,
-        "context": None,  # Add context field to state
-    }
+    # Return a cached response for a near-duplicate query in the same context
+    ctx_hash = cache.context_hash(chat_history)
+    cached_response = await asyncio.to_thread(cache.lookup, query, ctx_hash)
+    if cached_response is not None:
+        print(f"⚡ Semantic cache hit for query: '{query}'")
+        return cached_response, {"semantic_cache_hit": True}
 
     # Run the agent
-    result = agent_executor.invoke(state)
-
-    # Extract technical details
-    technical_details = {
-        "sql_query": result.get("sql_query"),
-        "query_type": result.get("query_type"),
-        "db_result": result.get("db_result"),
-        "api_result": result.get("api_result"),
-    }
+    result = await agent_executor.ainvoke(initial_state(query, chat_history))
+    if is_cacheable(result):
+        await asyncio.to_thread(cache.store, query, ctx_hash, result["response"])
 
     # Return both the response and technical details
-    return result["response"], technical_details
+    return result["response"], extract_technical_details(result)
+
+
+def process_user_query_with_details(
+    query: str, chat_history: List[Dict] = None
+) -> Tuple[str, Dict]:
+    """Process a user query and return both response and technical details."""
+    return run_sync(aprocess_user_query_with_details(query, chat_history))
+
+
+def process_user_query_stream(
+    query: str, chat_history: List[Dict] = None
+) -> Tuple[Iterator[str], Dict]:
+    """Process a user query and return a response token iterator and technical details.
+
+    The DB and API phases run before this returns; the LLM response is only
+    generated as the iterator is consumed.
+    """
+    if chat_history is None:
+        chat_history = []
+
+    # Return a cached response for a near-duplicate query in the same context
+    ctx_hash = cache.context_hash(chat_history)
+    cached_response = cache.lookup(query, ctx_hash)
+    if cached_response is not None:
+        print(f"⚡ Semantic cache hit for query: '{query}'")
+        return iter([cached_response]), {"semantic_cache_hit": True}
+
+    # Run the agent up to, but not including, the response generation
+    executor = get_agent_executor(include_response=False)
+    result = run_sync(executor.ainvoke(initial_state(query, chat_history)))
+
+    def response_iter() -> Iterator[str]:
+        chunks = []
+        for chunk in stream_response(result):
+            chunks.append(chunk)
+            yield chunk
+        if is_cacheable(result):
+            cache.store(query, ctx_hash, "".join(chunks))
+
+    return response_iter(), extract_technical_details(result)
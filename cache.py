@@ -0,0 +1,232 @@
+"""
+Semantic Cache - Returns stored responses for near-duplicate user queries.
+
+Queries are embedded with a small sentence-transformers model and looked up in
+a FAISS inner-product index. A hit requires both a cosine similarity above the
+threshold and the same conversation context hash, so a follow-up question is
+never answered with a response generated for a different conversation.
+
+Entries expire after SEMANTIC_CACHE_TTL seconds and at most
+SEMANTIC_CACHE_MAX_ENTRIES are kept. Each store appends one line (with its
+embedding) to an append-only log, which is compacted once it holds twice the
+entry limit, and the index is rebuilt from the log on startup.
+
+sentence-transformers and faiss are optional; without them the cache is
+disabled and every lookup is a miss. If the model cannot be loaded or the
+cache fails at runtime, it is disabled for RETRY_AFTER seconds instead of
+failing the query.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+try:
+    import faiss
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover - optional dependencies
+    faiss = None
+    np = None
+    SentenceTransformer = None
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("SEMANTIC_CACHE_DIR", ".semantic_cache")
+MODEL_NAME = os.getenv(
+    "SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+)
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+CONTEXT_MESSAGES = 4
+LOG_FILE = "entries.jsonl"
+RETRY_AFTER = 300
+
+_lock = threading.Lock()
+_model = None
+_index = None
+_entries: List[Dict] = []
+_vectors: List = []
+_log_lines = 0
+_disabled_until = 0.0
+
+
+def is_enabled() -> bool:
+    """Return True when the embedding dependencies are installed and working."""
+    return (
+        faiss is not None
+        and SentenceTransformer is not None
+        and time.time() >= _disabled_until
+    )
+
+
+def disable(error: Exception) -> None:
+    """Turn the cache (and plan index) off for RETRY_AFTER seconds after an error."""
+    global _disabled_until
+    logger.warning("Semantic cache disabled for %ds: %s", RETRY_AFTER, error)
+    _disabled_until = time.time() + RETRY_AFTER
+
+
+def context_hash(chat_history: Optional[List[Dict]]) -> str:
+    """Hash the last few completed messages into a conversation context signature.
+
+    A trailing user message is the query being answered, not context, so it is
+    left out; otherwise paraphrases of the same question could never match.
+    """
+    messages = chat_history or []
+    if messages and messages[-1].get("role") == "user":
+        messages = messages[:-1]
+    recent = messages[-CONTEXT_MESSAGES:]
+    return hashlib.md5(
+        "\n".join(m["content"] for m in recent).encode("utf-8")
+    ).hexdigest()
+
+
+def get_model():
+    """Load the sentence embedding model on first use."""
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+
+def embed(texts: List[str]):
+    """Embed texts as L2-normalized float32 vectors (cosine == inner product)."""
+    return get_model().encode(
+        texts, normalize_embeddings=True, convert_to_numpy=True
+    ).astype("float32")
+
+
+def _log_path() -> str:
+    """Return the path of the append-only entry log."""
+    return os.path.join(CACHE_DIR, LOG_FILE)
+
+
+def _is_fresh(entry: Dict, now: float) -> bool:
+    """Return True if the entry has not outlived the TTL."""
+    return now - entry["created"] < CACHE_TTL
+
+
+def _rebuild(now: float) -> None:
+    """Drop expired entries, keep the newest ones within the limit, and re-index.
+
+    When the limit is exceeded a quarter of it is evicted at once, so the
+    O(N) rebuild runs once per MAX_ENTRIES / 4 stores rather than on each.
+    """
+    global _entries, _vectors
+    keep = [i for i, entry in enumerate(_entries) if _is_fresh(entry, now)]
+    if len(keep) > MAX_ENTRIES:
+        keep = keep[len(keep) - max(1, MAX_ENTRIES * 3 // 4) :]
+    _entries = [_entries[i] for i in keep]
+    _vectors = [_vectors[i] for i in keep]
+    _index.reset()
+    if _vectors:
+        _index.add(np.vstack(_vectors))
+
+
+def _compact() -> None:
+    """Rewrite the log with only the entries currently kept."""
+    global _log_lines
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _log_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry, vector in zip(_entries, _vectors):
+            f.write(json.dumps({**entry, "vector": vector.tolist()}) + "\n")
+    os.replace(tmp_path, _log_path())
+    _log_lines = len(_entries)
+
+
+def _load() -> None:
+    """Rebuild the index from the persisted log, or start an empty index."""
+    global _index, _entries, _vectors
+    if _index is not None:
+        return
+
+    index = faiss.IndexFlatIP(get_model().get_sentence_embedding_dimension())
+    entries, vectors = [], []
+    if os.path.exists(_log_path()):
+        with open(_log_path(), "r", encoding="utf-8") as f:
+            for line in f:
+                # Skip lines left truncated or corrupt by an interrupted write
+                try:
+                    entry = json.loads(line)
+                    vector = np.asarray(entry.pop("vector"), dtype="float32")
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if vector.shape != (index.d,) or "created" not in entry:
+                    continue
+                vectors.append(vector)
+                entries.append(entry)
+
+    _index, _entries, _vectors = index, entries, vectors
+    _rebuild(time.time())
+    if entries:
+        _compact()
+
+
+def lookup(query: str, ctx_hash: str) -> Optional[str]:
+    """Return a cached response for a semantically equivalent query, if any."""
+    if not is_enabled():
+        return None
+
+    try:
+        with _lock:
+            _load()
+            if _index.ntotal == 0:
+                return None
+
+            now = time.time()
+            scores, ids = _index.search(embed([query]), min(5, _index.ntotal))
+            for score, idx in zip(scores[0], ids[0]):
+                if score < SIMILARITY_THRESHOLD:
+                    break
+                entry = _entries[idx]
+                if entry["ctx_hash"] == ctx_hash and _is_fresh(entry, now):
+                    return entry["response"]
+    except Exception as e:
+        disable(e)
+
+    return None
+
+
+def store(query: str, ctx_hash: str, response: str) -> None:
+    """Add a query/response pair to the cache and append it to the log."""
+    global _log_lines
+    if not is_enabled():
+        return
+
+    try:
+        with _lock:
+            _load()
+            now = time.time()
+            vector = embed([query])[0]
+            entry = {
+                "query": query,
+                "ctx_hash": ctx_hash,
+                "response": response,
+                "created": now,
+            }
+            _entries.append(entry)
+            _vectors.append(vector)
+            if len(_entries) > MAX_ENTRIES:
+                _rebuild(now)
+            else:
+                _index.add(vector[None, :])
+
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(_log_path(), "a", encoding="utf-8") as f:
+                f.write(json.dumps({**entry, "vector": vector.tolist()}) + "\n")
+            _log_lines += 1
+            if _log_lines > 2 * MAX_ENTRIES:
+                _compact()
+    except Exception as e:
+        disable(e)
@@ -0,0 +1,81 @@
+"""
+Plan Index - Nearest-neighbour search over the plan catalog.
+
+Every plan row (Category + Plans + Description) is embedded once with the
+semantic cache's sentence model and stored in a FAISS inner-product index, so
+a query that clearly names a plan can be answered from the catalog without
+generating SQL or querying the database.
+
+Like the semantic cache, this needs the optional sentence-transformers and
+faiss dependencies; without them, or while the cache is disabled after an
+error, every search returns no rows.
+"""
+
+import logging
+import os
+import threading
+from typing import Callable, Dict, List
+
+from dotenv import load_dotenv
+
+import cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = float(os.getenv("PLAN_SEARCH_THRESHOLD", "0.6"))
+
+_lock = threading.Lock()
+_index = None
+_rows: List[Dict] = []
+
+
+def _build(rows: List[Dict]) -> None:
+    """Embed every plan row and add it to the index."""
+    global _index, _rows
+    texts = [
+        " ".join(str(row.get(k) or "") for k in ("Category", "Plans", "Description"))
+        for row in rows
+    ]
+
+    index = cache.faiss.IndexFlatIP(
+        cache.get_model().get_sentence_embedding_dimension()
+    )
+    if texts:
+        index.add(cache.embed(texts))
+    _index, _rows = index, rows
+
+
+def search(
+    query: str, load_rows: Callable[[], List[Dict]], k: int = 5
+) -> List[Dict]:
+    """Return the catalog rows most similar to the query above the threshold.
+
+    load_rows is called on the first search to fetch the catalog; if it raises,
+    no index is built and the next search tries again.
+    """
+    if not cache.is_enabled():
+        return []
+
+    try:
+        with _lock:
+            if _index is None:
+                try:
+                    rows = load_rows()
+                except Exception as e:
+                    logger.warning("Could not load the plan catalog: %s", e)
+                    return []
+                _build(rows)
+            if _index.ntotal == 0:
+                return []
+            scores, ids = _index.search(cache.embed([query]), min(k, _index.ntotal))
+    except Exception as e:
+        cache.disable(e)
+        return []
+
+    return [
+        _rows[idx]
+        for score, idx in zip(scores[0], ids[0])
+        if score > SIMILARITY_THRESHOLD
+    ]
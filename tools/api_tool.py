@@ -1,13 +1,81 @@
+import asyncio
+from urllib.parse import quote
+
+import httpx
 import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def category_endpoint(category):
+    """
+    Builds the endpoint listing the plans of a category.
+    :param category: The category name.
+    :return: The endpoint with the category name percent-encoded.
+    """
+    return f"plans/category/{quote(str(category), safe='')}"
+
+
+def plan_endpoint(plan):
+    """
+    Builds the endpoint for a single plan.
+    :param plan: The plan name.
+    :return: The endpoint with the plan name percent-encoded.
+    """
+    return f"plans/{quote(str(plan), safe='')}"
+
+
+def _cache_key(method, endpoint, params=None):
+    """
+    Builds the response cache key for a request.
+    :param method: The HTTP method.
+    :param endpoint: The API endpoint.
+    :param params: URL parameters (optional).
+    :return: A hashable key identifying the request.
+    """
+    return (method.upper(), endpoint, frozenset((params or {}).items()))
+
+
+def _invalidate(cache, endpoint):
+    """
+    Drops every cached response whose endpoint starts with the given endpoint.
+    :param cache: The response cache.
+    :param endpoint: The endpoint prefix that was written to.
+    """
+    prefix = endpoint.rstrip("/")
+    for key in [key for key in cache if key[1].startswith(prefix)]:
+        cache.pop(key, None)
 
 
 class ApiTool:
-    def __init__(self, api_url):
+    def __init__(self, api_url, cache_size=512, cache_ttl=300):
         """
         Initializes the ApiTool object with the API base URL.
         :param api_url: The base URL for the API requests.
+        :param cache_size: Maximum number of cached GET responses.
+        :param cache_ttl: Seconds a cached GET response stays valid.
         """
         self.api_url = api_url
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+        # Reuse keep-alive connections across requests and retry transient errors
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=[502, 503, 504],
+                raise_on_status=False,
+            ),
+        )
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(
+            {"Accept": "application/json", "Accept-Encoding": "gzip"}
+        )
 
     def send_request(
         self, endpoint, method="GET", params=None, data=None, headers=None
@@ -24,20 +92,112 @@ class ApiTool:
         url = f"{self.api_url}/{endpoint}"
 
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, params=params, headers=headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, json=data, headers=headers)
-            elif method.upper() == "PUT":
-                response = requests.put(url, json=data, headers=headers)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, params=params, headers=headers)
-            else:
+            method = method.upper()
+            if method not in ("GET", "POST", "PUT", "DELETE"):
                 raise ValueError(f"Unsupported HTTP method: {method}")
 
+            # Serve repeated GETs from the cache, writes invalidate the endpoint
+            key = _cache_key(method, endpoint, params)
+            if method == "GET":
+                if key in self._cache:
+                    return self._cache[key]
+            else:
+                _invalidate(self._cache, endpoint)
+
+            response = self._session.request(
+                method,
+                url,
+                params=params if method in ("GET", "DELETE") else None,
+                json=data if method in ("POST", "PUT") else None,
+                headers=headers,
+                timeout=(3, 10),
+            )
+
+            # Check if the request was successful (status code 200-299)
+            if response.status_code >= 200 and response.status_code < 300:
+                result = response.json()  # Assuming the API returns JSON data
+                if method == "GET":
+                    self._cache[key] = result
+                return result
+            else:
+                return {
+                    "error": f"Request failed with status code {response.status_code}",
+                    "response": response.text,
+                }
+
+        except Exception as e:
+            return {"error": f"An error occurred: {str(e)}"}
+
+
+class AsyncApiTool:
+    def __init__(self, api_url, max_connections=32, cache_size=512, cache_ttl=300):
+        """
+        Initializes the AsyncApiTool object with the API base URL.
+        :param api_url: The base URL for the API requests.
+        :param max_connections: Maximum number of concurrent connections.
+        :param cache_size: Maximum number of cached GET responses.
+        :param cache_ttl: Seconds a cached GET response stays valid.
+        """
+        self.api_url = api_url
+        self.max_connections = max_connections
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._client = None
+        self._loop = None
+        self.batch_supported = None  # Unknown until the first send_batch
+
+    def _get_client(self):
+        """
+        Returns the shared httpx.AsyncClient, creating it on first use.
+        The client is bound to the running event loop, so it is recreated
+        whenever the caller runs on a different loop (e.g. a new asyncio.run).
+        :return: The httpx.AsyncClient for the current event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_url,
+                http2=True,
+                limits=httpx.Limits(max_connections=self.max_connections),
+                headers={"Accept": "application/json", "Accept-Encoding": "gzip"},
+            )
+            self._loop = loop
+        return self._client
+
+    async def send_request(
+        self, endpoint, method="GET", params=None, data=None, headers=None
+    ):
+        """
+        Sends an API request asynchronously and returns the response.
+        :param endpoint: The API endpoint to which the request will be sent.
+        :param method: The HTTP method (e.g., "GET", "POST", "PUT", "DELETE").
+        :param params: URL parameters for the request (optional).
+        :param data: Data for POST/PUT requests (optional).
+        :param headers: Headers for the request (optional).
+        :return: The response from the API.
+        """
+        method = method.upper()
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            return {"error": f"An error occurred: Unsupported HTTP method: {method}"}
+
+        # Serve repeated GETs from the cache, writes invalidate the endpoint
+        key = _cache_key(method, endpoint, params)
+        if method == "GET":
+            if key in self._cache:
+                return self._cache[key]
+        else:
+            _invalidate(self._cache, endpoint)
+
+        try:
+            response = await self._get_client().request(
+                method, endpoint, params=params, json=data, headers=headers
+            )
+
             # Check if the request was successful (status code 200-299)
             if response.status_code >= 200 and response.status_code < 300:
-                return response.json()  # Assuming the API returns JSON data
+                result = response.json()  # Assuming the API returns JSON data
+                if method == "GET":
+                    self._cache[key] = result
+                return result
             else:
                 return {
                     "error": f"Request failed with status code {response.status_code}",
@@ -47,6 +207,38 @@ class ApiTool:
         except Exception as e:
             return {"error": f"An error occurred: {str(e)}"}
 
+    async def send_batch(self, categories=None, plans=None):
+        """
+        Fetches plans for several categories and/or plan names in one round trip
+        via the server's plans/batch endpoint. A 404/405 marks the endpoint as
+        unsupported (see batch_supported) so callers can fall back to per-item
+        requests.
+        :param categories: Category names to fetch plans for (optional).
+        :param plans: Plan names to fetch details for (optional).
+        :return: A dict mapping each category/plan name to its response.
+        """
+        payload = {"categories": list(categories or []), "plans": list(plans or [])}
+
+        try:
+            response = await self._get_client().post("plans/batch", json=payload)
+
+            # Check if the request was successful (status code 200-299)
+            if response.status_code >= 200 and response.status_code < 300:
+                result = response.json()
+                if not isinstance(result, dict):
+                    return {"error": "Unexpected batch response format"}
+                self.batch_supported = True
+                return result
+            if response.status_code in (404, 405):
+                self.batch_supported = False
+            return {
+                "error": f"Request failed with status code {response.status_code}",
+                "response": response.text,
+            }
+
+        except Exception as e:
+            return {"error": f"An error occurred: {str(e)}"}
+
 
 if __name__ == "__main__":
     # Example usage:
@@ -1,74 +1,721 @@
+import asyncio
+import copy
+import functools
 import mysql.connector
-import json
+from mysql.connector import pooling
+import io
+import logging
+import orjson
 import os
-from typing import Dict, Any, List, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 from dotenv import load_dotenv
 
+try:
+    import aiomysql
+except ImportError:  # pragma: no cover - optional dependency
+    aiomysql = None
 
-class DatabaseQueryTool:
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Table names following FROM/JOIN/INTO/UPDATE/TABLE (or INSERT/REPLACE
+# without INTO), skipping MySQL modifiers such as "UPDATE LOW_PRIORITY t" and
+# including comma lists such as "FROM a x, b AS y"
+_NAME = r"[`\"]?[\w$]+[`\"]?(?:\.[`\"]?[\w$]+[`\"]?)?"
+_MODIFIERS = r"(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE|QUICK)\s+)*"
+_TABLE_RE = re.compile(
+    rf"\b(?:(?:INSERT|REPLACE)\s+{_MODIFIERS}(?:INTO\s+)?|"
+    rf"(?:FROM|JOIN|INTO|UPDATE|TRUNCATE(?:\s+TABLE)?|TABLE)\s+{_MODIFIERS})"
+    rf"((?:{_NAME}(?:\s+(?:AS\s+)?\w+)?\s*,\s*)*{_NAME})",
+    re.I,
+)
+
+# String and numeric literals written inline in a SQL statement
+INLINE_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+INLINE_LITERAL_LIMIT = 2
+
+# Quoted strings and identifiers, whose text must not be normalized
+_QUOTED_RE = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)""")
+_SPACE_RE = re.compile(r"\s+")
+
+# Statements that return rows and never write
+_FIRST_TOKEN_RE = re.compile(r"\s*([A-Za-z]+)")
+READ_KINDS = {"select", "show", "describe", "desc", "explain"}
+
+# Parentheses, quoted text and words, for finding the main statement of a WITH
+_WITH_TOKEN_RE = re.compile(r"[()]|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|\w+")
+_WITH_MAIN_KINDS = {"select", "insert", "update", "delete", "replace"}
+
+# Unprojected SELECTs, and the row cap DB_AUTO_LIMIT adds to unbounded ones
+_SELECT_STAR_RE = re.compile(r"\bselect\s+(?:distinct\s+)?(?:\w+\.)?\*", re.I)
+_LIMIT_RE = re.compile(r"\blimit\b", re.I)
+_WHERE_RE = re.compile(r"\bwhere\b", re.I)
+AUTO_LIMIT_ROWS = 10000
+
+
+def referenced_tables(query: str) -> Set[str]:
     """
-    Agent tool to connect to a MySQL database (including AWS RDS) and execute SQL queries.
-    Returns results in JSON format.
+    Extract the (unqualified, lower-cased) table names a SQL statement references.
+
+    Args:
+        query: SQL query to scan
+
+    Returns:
+        Set of table names following FROM/JOIN/INTO/UPDATE/TABLE keywords
     """
+    tables = set()
+    for names in _TABLE_RE.findall(query):
+        for name in names.split(","):
+            name = name.split()[0]
+            tables.add(name.rsplit(".", 1)[-1].strip("`\"").lower())
+    return tables
 
-    def __init__(self):
-        # Load environment variables from .env file automatically
-        load_dotenv()
 
-        # Get connection params from environment variables
-        self.connection_params = {
+@functools.lru_cache(maxsize=1)
+def _load_params() -> Mapping[str, Any]:
+    """
+    Read the connection params from the environment once per process.
+
+    Returns:
+        Read-only mapping of mysql.connector connection params
+    """
+    # Load environment variables from .env file automatically
+    load_dotenv()
+
+    if not mysql.connector.HAVE_CEXT:
+        logger.warning(
+            "mysql-connector C extension is not available; "
+            "falling back to the slower pure Python driver"
+        )
+
+    return MappingProxyType(
+        {
             "database": os.getenv("DB_NAME"),
             "user": os.getenv("DB_USER"),
             "password": os.getenv("DB_PASSWORD"),
             "host": os.getenv("DB_HOST"),
             "port": os.getenv("DB_PORT", "3306"),
+            # Statements commit on their own, so a read never leaves a pooled
+            # connection holding an old snapshot; execute_many and transaction()
+            # open explicit transactions
+            "autocommit": True,
+            # Parse packets and convert rows in the C extension when available
+            "use_pure": not mysql.connector.HAVE_CEXT,
+            # Cursors stream rows from the server instead of buffering them
+            "buffered": False,
+            "raw": False,
         }
+    )
+
+
+def _check_params(params: Mapping[str, Any]) -> None:
+    """Raise ValueError if a required connection param is not configured."""
+    required_params = ["database", "user", "password", "host"]
+    missing_params = [param for param in required_params if not params.get(param)]
+
+    if missing_params:
+        raise ValueError(
+            f"Missing required environment variables: {', '.join(['DB_' + p.upper() for p in missing_params])}"
+        )
+
+
+def _close_cursor(cursor) -> None:
+    """Close a cursor, releasing its server-side prepared statement if any."""
+    try:
+        cursor.close()
+    except mysql.connector.Error:
+        pass
+
+
+def _pool_size(size: int) -> int:
+    """Clamp a configured pool size to what MySQLConnectionPool accepts."""
+    clamped = min(max(size, 1), pooling.CNX_POOL_MAXSIZE)
+    if clamped != size:
+        logger.warning(
+            "DB_POOL_SIZE=%d is outside 1-%d, using %d",
+            size,
+            pooling.CNX_POOL_MAXSIZE,
+            clamped,
+        )
+    return clamped
+
 
-        # Validate required parameters
-        required_params = ["database", "user", "password", "host"]
-        missing_params = [
-            param for param in required_params if not self.connection_params.get(param)
-        ]
+def _rollback(conn) -> None:
+    """Roll back a connection, ignoring one the server has already dropped."""
+    try:
+        conn.rollback()
+    except mysql.connector.Error:
+        pass
 
-        if missing_params:
-            raise ValueError(
-                f"Missing required environment variables: {', '.join(['DB_' + p.upper() for p in missing_params])}"
+
+def _cache_key(query: str) -> str:
+    """Normalize whitespace and case in a query, leaving quoted text untouched."""
+    parts = _QUOTED_RE.split(query)
+    for i in range(0, len(parts), 2):
+        parts[i] = _SPACE_RE.sub(" ", parts[i]).lower()
+    return "".join(parts).strip()
+
+
+def _classify(query: str) -> str:
+    """
+    Return the lower-cased leading keyword of a SQL statement, or ''.
+
+    A WITH statement is classified by its main statement after the CTEs, so
+    WITH ... SELECT is "select" and WITH ... UPDATE/DELETE is a write.
+    """
+    match = _FIRST_TOKEN_RE.match(query)
+    kind = match.group(1).lower() if match else ""
+    if kind != "with":
+        return kind
+
+    depth = 0
+    for token in _WITH_TOKEN_RE.findall(query, match.end()):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token.lower() in _WITH_MAIN_KINDS:
+            return token.lower()
+    return kind
+
+
+_BYTES_TYPES = (bytes, bytearray)
+
+# Turns a batch of tuple rows into JSON-serializable result dicts
+RowBuilder = Callable[[List[Sequence[Any]]], List[Dict[str, Any]]]
+
+
+def _bytes_indexes(row: Sequence[Any]) -> Tuple[int, ...]:
+    """
+    Return the positions of the columns of a result set that may hold bytes.
+
+    Column types are uniform across a result set, so the first row decides;
+    columns that are NULL in it are kept because their type is unknown.
+    """
+    return tuple(
+        index
+        for index, value in enumerate(row)
+        if value is None or type(value) in _BYTES_TYPES
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_row_builder(
+    names: Tuple[str, ...], bytes_indexes: Tuple[int, ...]
+) -> RowBuilder:
+    """
+    Generate a function that builds result dicts from tuple rows of one schema.
+
+    The column names are constants of a dict display, and only the columns
+    that may hold bytes get a decode check, so each row is built in one pass.
+    """
+    items = []
+    for index, name in enumerate(names):
+        value = f"row[{index}]"
+        if index in bytes_indexes:
+            value = (
+                f"({value}.decode('utf-8', 'replace') "
+                f"if type({value}) in BYTES_TYPES else {value})"
             )
+        items.append(f"{name!r}: {value}")
+    source = f"def build(rows):\n    return [{{{', '.join(items)}}} for row in rows]"
+    namespace: Dict[str, Any] = {"BYTES_TYPES": _BYTES_TYPES}
+    exec(source, namespace)
+    return namespace["build"]
+
+
+def _row_builder(cursor, first_row: Sequence[Any]) -> RowBuilder:
+    """Return the row builder for the result set this row starts."""
+    names = tuple(column[0] for column in cursor.description)
+    return _compile_row_builder(names, _bytes_indexes(first_row))
+
+
+class DatabaseQueryTool:
+    """
+    Agent tool to connect to a MySQL database (including AWS RDS) and execute SQL queries.
+    Returns results in JSON format.
 
-        self.conn = None
+    Queries should name the columns they need and bound their rows, e.g.
+    "SELECT Category, Plans FROM plans LIMIT 100" rather than "SELECT * FROM plans";
+    every extra column and row is sent over the wire and serialized.
+    """
+
+    def __init__(self):
+        # Get connection params from environment variables (read once)
+        self.connection_params = dict(_load_params())
+        _check_params(self.connection_params)
+
+        # Cache of SELECT results keyed by normalized SQL, with the keys that
+        # read each table so writes can invalidate them
+        self.cache_size = int(os.getenv("DB_CACHE_SIZE", "256"))
+        self.cache_ttl = float(os.getenv("DB_CACHE_TTL", "300"))
+        self._cache: "OrderedDict[str, tuple[float, dict, Set[str]]]" = OrderedDict()
+        self._table_index: Dict[str, Set[str]] = {}
+        self._cache_lock = threading.Lock()
+
+        # Prepared cursors keyed by (server connection id, SQL template), so a
+        # repeated parameterized query reuses its server-side statement
+        self.statement_cache_size = 128
+        self._statements: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._statements_lock = threading.Lock()
+        # Cursors evicted from the LRU, by server connection id; each is closed
+        # by the next thread that holds its connection, never concurrently
+        self._retired_statements: Dict[Any, List[Any]] = {}
+
+        # Optionally cap SELECTs that have no LIMIT of their own
+        self.auto_limit = os.getenv("DB_AUTO_LIMIT", "0") == "1"
+
+        # Reads without WHERE or LIMIT are rejected on tables with more rows
+        # than this (0 disables the check); row counts are reloaded every TTL
+        self.max_unbounded_rows = int(os.getenv("DB_MAX_UNBOUNDED_ROWS", "100000"))
+        self._table_row_counts: Dict[str, int] = {}
+        self._table_rows_refresh_at = 0.0
+        self._table_row_counts_lock = threading.Lock()
+
+        # SELECT rows are read from an unbuffered cursor in batches of this size
+        self.fetch_size = int(os.getenv("DB_FETCH_SIZE", "1000"))
+
+        # Connections are pooled; the pool is created on first use. Borrowing
+        # from an exhausted pool waits up to pool_timeout seconds
+        self.pool_size = _pool_size(int(os.getenv("DB_POOL_SIZE", "20")))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+        self.pool = None
+        self._pool_lock = threading.Lock()
+
+        # Per-thread connection held by an open transaction()
+        self._local = threading.local()
+
+    def prepare(self) -> None:
+        """Create the connection pool ahead of the first query, if needed."""
+        with self._pool_lock:
+            if self.pool is not None:
+                return
+            try:
+                self.pool = pooling.MySQLConnectionPool(
+                    pool_name="podisc",
+                    pool_size=self.pool_size,
+                    pool_reset_session=False,
+                    **self.connection_params,
+                )
+            except Exception as e:
+                raise ConnectionError(f"Failed to connect to MySQL database: {str(e)}")
+
+    async def aprepare(self) -> None:
+        """Create the connection pool in a worker thread without blocking the loop."""
+        await asyncio.to_thread(self.prepare)
+
+    def _get_connection(self):
+        """
+        Borrow a connection from the pool, waiting for one to be returned.
+
+        MySQLConnectionPool raises PoolError as soon as every connection is in
+        use, so a burst of queries polls with backoff for up to pool_timeout
+        seconds before giving up.
+        """
+        deadline = time.monotonic() + self.pool_timeout
+        delay = 0.005
+        while True:
+            try:
+                return self.pool.get_connection()
+            except mysql.connector.PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+
+    def execute_query(
+        self, query: str, params: Optional[Sequence[Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute SQL query and return results as JSON.
+
+        Repeated SELECTs are served from a TTL cache until the TTL expires or a
+        write through this tool touches one of the tables they read. Queries
+        with params run as prepared statements that are reused across calls.
+
+        Args:
+            query: SQL query to execute, with %s placeholders for params
+            params: Optional values bound to the query placeholders
+
+        Returns:
+            Dictionary with query results and metadata
+        """
+        if params is None:
+            literals = len(INLINE_LITERAL_RE.findall(query))
+            if literals > INLINE_LITERAL_LIMIT:
+                logger.info(
+                    "Query has %d inline literals; pass them as params so its "
+                    "prepared statement can be reused: %s",
+                    literals,
+                    query,
+                )
+
+        kind = _classify(query)
+        if kind == "select":
+            if _SELECT_STAR_RE.search(query):
+                logger.warning(
+                    "SELECT * fetches every column; list the columns you need: %s",
+                    query,
+                )
+            if self.auto_limit and not _LIMIT_RE.search(query):
+                query = f"{query.rstrip().rstrip(';')} LIMIT {AUTO_LIMIT_ROWS}"
+
+        if kind == "select" and self.max_unbounded_rows > 0:
+            large_tables = self._unbounded_large_tables(query)
+            if large_tables:
+                error = (
+                    f"Add WHERE or LIMIT: {', '.join(large_tables)} has more than "
+                    f"{self.max_unbounded_rows} rows"
+                )
+                return {
+                    "success": False,
+                    "results": [],
+                    "row_count": 0,
+                    "error": error,
+                    "message": f"Query rejected: {error}",
+                }
+
+        key = _cache_key(query)
+        if params is not None:
+            key = f"{key}\x00{tuple(params)!r}"
+        is_select = kind in READ_KINDS
 
-    def connect(self) -> None:
-        """Establish connection to the MySQL database."""
+        # Inside a transaction reads may see uncommitted writes, so skip the cache
+        in_transaction = self._transaction_conn() is not None
+
+        if is_select and not in_transaction:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+        result = self._run_query(query, params, is_select)
+
+        if result["success"]:
+            if not is_select:
+                self._invalidate(query)
+                if in_transaction:
+                    self._local.writes.append(query)
+            elif not in_transaction:
+                self._cache_put(key, query, result)
+
+        return result
+
+    def _unbounded_large_tables(self, query: str) -> List[str]:
+        """Return the large tables a read without WHERE or LIMIT would scan."""
+        if _LIMIT_RE.search(query) or _WHERE_RE.search(query):
+            return []
+        row_counts = self._table_rows()
+        return sorted(
+            table
+            for table in referenced_tables(query)
+            if row_counts.get(table, 0) > self.max_unbounded_rows
+        )
+
+    def _table_rows(self) -> Dict[str, int]:
+        """Return the (estimated) row count of every table, via SHOW TABLE STATUS.
+
+        The counts are reloaded once per cache TTL (at least a minute), so a
+        growing table is eventually caught; a failed load keeps the previous
+        counts and is not retried before the next refresh.
+        """
+        with self._table_row_counts_lock:
+            if time.time() >= self._table_rows_refresh_at:
+                self._table_rows_refresh_at = time.time() + max(self.cache_ttl, 60.0)
+                try:
+                    self._table_row_counts = self._load_table_rows()
+                except mysql.connector.Error as e:
+                    logger.warning("Could not load table sizes: %s", e)
+            return self._table_row_counts
+
+    def _load_table_rows(self) -> Dict[str, int]:
+        """Read the table sizes on a pooled connection of their own.
+
+        Never on this thread's transaction connection, whose outcome must not
+        depend on the status query.
+        """
+        self.prepare()
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW TABLE STATUS")
+                return {
+                    row["Name"].lower(): row["Rows"] or 0 for row in cursor.fetchall()
+                }
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def execute_many(
+        self, query: str, rows: Sequence[Sequence[Any]]
+    ) -> Dict[str, Any]:
+        """
+        Execute a write statement once per parameter row and commit once.
+
+        mysql.connector rewrites a multi-row INSERT into a single statement;
+        other statements still run on one connection with one commit.
+
+        Args:
+            query: INSERT/UPDATE/DELETE statement with %s placeholders
+            rows: Sequence of parameter rows to bind
+
+        Returns:
+            Dictionary with the affected row count and metadata
+        """
+        self.prepare()
+
+        tx_conn = self._transaction_conn()
+        conn = None
         try:
-            self.conn = mysql.connector.connect(**self.connection_params)
+            conn = tx_conn or self._get_connection()
+            if tx_conn is None:
+                conn.start_transaction()
+            cursor = conn.cursor()
+            cursor.executemany(query, rows)
+            row_count = cursor.rowcount
+            cursor.close()
+
+            if tx_conn is None:
+                conn.commit()
+            else:
+                self._local.writes.append(query)
+            self._invalidate(query)
+
+            return {
+                "success": True,
+                "results": [],
+                "row_count": row_count,
+                "message": f"Batch executed successfully. Affected {row_count} rows.",
+            }
+
         except Exception as e:
-            raise ConnectionError(f"Failed to connect to MySQL database: {str(e)}")
+            if tx_conn is not None:
+                self._local.error = str(e)
+            elif conn is not None:
+                _rollback(conn)
 
-    def execute_query(self, query: str) -> Dict[str, Any]:
+            return {
+                "success": False,
+                "results": [],
+                "row_count": 0,
+                "error": str(e),
+                "message": f"Batch execution failed: {str(e)}",
+            }
+
+        finally:
+            if conn is not None and tx_conn is None:
+                conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
         """
-        Execute SQL query and return results as JSON.
+        Run every query issued by this thread inside the block on one connection
+        and commit them together when the block exits.
+
+        The transaction is rolled back if the block raises or any query in it
+        failed; a failed query makes the block raise RuntimeError on exit.
+        """
+        if self._transaction_conn() is not None:
+            raise RuntimeError("Nested transactions are not supported")
+
+        self.prepare()
+        conn = self._get_connection()
+        self._local.conn = conn
+        self._local.error = None
+        self._local.writes = []
+        try:
+            conn.start_transaction()
+            yield
+            if self._local.error is not None:
+                raise RuntimeError(f"Transaction rolled back: {self._local.error}")
+            conn.commit()
+        except BaseException:
+            _rollback(conn)
+            raise
+        finally:
+            writes = self._local.writes
+            self._local.conn = None
+            conn.close()
+            # Reads cached by other threads while the transaction was open
+            # may predate its commit
+            for query in writes:
+                self._invalidate(query)
+
+    def _transaction_conn(self):
+        """Return the connection of this thread's open transaction, if any."""
+        return getattr(self._local, "conn", None)
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a fresh cached result, or None."""
+        if self.cache_ttl <= 0:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            timestamp, result, _ = entry
+            if time.time() - timestamp >= self.cache_ttl:
+                self._drop(key)
+                return None
+            self._cache.move_to_end(key)
+            return copy.deepcopy(result)
+
+    def _cache_put(self, key: str, query: str, result: Dict[str, Any]) -> None:
+        """Store a SELECT result and index it by the tables it reads."""
+        if self.cache_ttl <= 0 or self.cache_size <= 0:
+            return
+        tables = referenced_tables(query)
+        with self._cache_lock:
+            if key in self._cache:
+                self._drop(key)
+            self._cache[key] = (time.time(), copy.deepcopy(result), tables)
+            for table in tables:
+                self._table_index.setdefault(table, set()).add(key)
+            while len(self._cache) > self.cache_size:
+                self._drop(next(iter(self._cache)))
+
+    def _drop(self, key: str) -> None:
+        """Remove a cached result and its table index entries (lock held)."""
+        _, _, tables = self._cache.pop(key)
+        for table in tables:
+            keys = self._table_index.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._table_index[table]
+
+    def _invalidate(self, query: str) -> None:
+        """Drop cached results that read a table written by the query."""
+        tables = referenced_tables(query)
+        with self._cache_lock:
+            # A write we cannot attribute to a table invalidates everything
+            if not tables:
+                self._cache.clear()
+                self._table_index.clear()
+                return
+            for table in tables:
+                for key in list(self._table_index.get(table, ())):
+                    self._drop(key)
+
+    def _prepared_cursor(self, conn, query: str):
+        """Return the cached prepared cursor for a query on this connection."""
+        key = (conn.connection_id, query)
+        with self._statements_lock:
+            cursor = self._statements.get(key)
+            if cursor is not None:
+                self._statements.move_to_end(key)
+                return cursor
+
+        cursor = conn.cursor(prepared=True, buffered=False, raw=False)
+        with self._statements_lock:
+            self._statements[key] = cursor
+            while len(self._statements) > self.statement_cache_size:
+                (connection_id, _), evicted = self._statements.popitem(last=False)
+                self._retired_statements.setdefault(connection_id, []).append(
+                    evicted
+                )
+        return cursor
+
+    def _forget_statement(self, conn, query: str) -> None:
+        """Drop and close the cached prepared cursor for a query on this connection."""
+        with self._statements_lock:
+            cursor = self._statements.pop((conn.connection_id, query), None)
+        if cursor is not None:
+            _close_cursor(cursor)
+
+    def _close_retired_statements(self, conn) -> None:
+        """Close prepared cursors evicted while this connection was elsewhere."""
+        if not self._retired_statements:
+            return
+        with self._statements_lock:
+            cursors = self._retired_statements.pop(conn.connection_id, [])
+        for cursor in cursors:
+            _close_cursor(cursor)
+
+    def _open_cursor(self, conn, query: str, params: Optional[Sequence[Any]]):
+        """Return an unbuffered tuple cursor, prepared when params are given."""
+        if params is not None:
+            cursor = self._prepared_cursor(conn, query)
+        else:
+            cursor = conn.cursor(buffered=False, raw=False)
+        cursor.arraysize = self.fetch_size
+        return cursor
+
+    def _run_query(
+        self,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        is_select: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Execute SQL query against the database, bypassing the cache.
 
         Args:
             query: SQL query to execute
+            params: Optional values bound to the query placeholders
+            is_select: Whether the query returns rows; classified if omitted
 
         Returns:
             Dictionary with query results and metadata
         """
-        if not self.conn or not self.conn.is_connected():
-            self.connect()
+        self.prepare()
+        if is_select is None:
+            is_select = _classify(query) in READ_KINDS
 
+        tx_conn = self._transaction_conn()
+        conn = None
         try:
-            # Create cursor
-            cursor = self.conn.cursor(dictionary=True)
+            # Borrow a connection from the pool unless a transaction holds one
+            conn = tx_conn or self._get_connection()
+            self._close_retired_statements(conn)
 
-            # Execute query
-            cursor.execute(query)
+            # Execute query; pooled connections are not pinged before use, so
+            # a read on a connection the server dropped reconnects and retries
+            cursor = self._open_cursor(conn, query, params)
+            try:
+                cursor.execute(query, params)
+            except (mysql.connector.OperationalError, mysql.connector.InterfaceError):
+                if not is_select or tx_conn is not None:
+                    raise
+                self._forget_statement(conn, query)
+                conn.reconnect()
+                cursor = self._open_cursor(conn, query, params)
+                cursor.execute(query, params)
 
-            # Fetch results if it's a SELECT query
-            if query.strip().lower().startswith("select"):
-                results_list = cursor.fetchall()
-            else:
-                results_list = []
+            # Stream result rows in batches, converting them as they arrive
+            results_list = []
+            if is_select:
+                build = None
+                while True:
+                    batch = cursor.fetchmany(cursor.arraysize)
+                    if not batch:
+                        break
+                    if build is None:
+                        build = _row_builder(cursor, batch[0])
+                    results_list.extend(build(batch))
 
             # Get row count for operations
             row_count = cursor.rowcount
@@ -76,30 +723,15 @@ class DatabaseQueryTool:
             # Get last inserted id if applicable
             last_id = cursor.lastrowid if hasattr(cursor, "lastrowid") else None
 
-            # Commit if this was a write operation
-            if not query.strip().lower().startswith("select"):
-                self.conn.commit()
-
-            cursor.close()
-
-            # Create a result that's fully JSON serializable
-            serializable_results = []
-            for row in results_list:
-                serializable_row = {}
-                for key, value in row.items():
-                    # Convert non-serializable types to strings
-                    if isinstance(value, (bytes, bytearray)):
-                        serializable_row[key] = value.decode("utf-8", errors="replace")
-                    else:
-                        serializable_row[key] = value
-                serializable_results.append(serializable_row)
+            if params is None:
+                cursor.close()
 
             # Return JSON-serializable result
             result = {
                 "success": True,
-                "results": serializable_results,
+                "results": results_list,
                 "row_count": row_count,
-                "message": f"Query executed successfully. Returned {len(serializable_results)} rows.",
+                "message": f"Query executed successfully. Returned {len(results_list)} rows.",
             }
 
             if last_id:
@@ -108,9 +740,13 @@ class DatabaseQueryTool:
             return result
 
         except Exception as e:
-            # Rollback on error
-            if self.conn and self.conn.is_connected():
-                self.conn.rollback()
+            # A failed statement is prepared again on its next use
+            if params is not None and conn is not None:
+                self._forget_statement(conn, query)
+
+            # A transaction rolls back when it exits
+            if tx_conn is not None:
+                self._local.error = str(e)
 
             # Return error information
             return {
@@ -121,37 +757,325 @@ class DatabaseQueryTool:
                 "message": f"Query execution failed: {str(e)}",
             }
 
+        finally:
+            # Return the connection to the pool
+            if conn is not None and tx_conn is None:
+                conn.close()
+
+    def execute_query_stream(
+        self, query: str, params: Optional[Sequence[Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Execute a SELECT query and yield its rows as they arrive from the server.
+
+        Rows bypass the result cache and at most one fetch batch is held in
+        memory. Stopping iteration early discards the unread rows and returns
+        the connection to the pool.
+
+        Args:
+            query: SELECT query to execute
+            params: Optional values bound to the query placeholders
+
+        Returns:
+            Iterator over JSON-serializable result rows
+
+        Raises:
+            mysql.connector.Error: If the query fails
+        """
+        self.prepare()
+
+        conn = self._get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor(buffered=False, raw=False)
+            cursor.arraysize = self.fetch_size
+            cursor.execute(query, params)
+            build = None
+            while True:
+                batch = cursor.fetchmany(cursor.arraysize)
+                if not batch:
+                    break
+                if build is None:
+                    build = _row_builder(cursor, batch[0])
+                yield from build(batch)
+        finally:
+            # Discard rows left unread when the caller stopped early
+            if conn.unread_result:
+                conn.consume_results()
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    def execute_query_ndjson(
+        self, query: str, fp: IO, params: Optional[Sequence[Any]] = None
+    ) -> int:
+        """
+        Execute a SELECT query and write its rows to a stream as NDJSON.
+
+        Args:
+            query: SELECT query to execute
+            fp: Text or binary file object to write one JSON row per line to
+            params: Optional values bound to the query placeholders
+
+        Returns:
+            Number of rows written
+        """
+        binary = not isinstance(fp, io.TextIOBase)
+        count = 0
+        for row in self.execute_query_stream(query, params):
+            line = orjson.dumps(row, default=str, option=orjson.OPT_APPEND_NEWLINE)
+            fp.write(line if binary else line.decode("utf-8"))
+            count += 1
+        return count
+
+    def execute_query_arrow(
+        self, query: str, params: Optional[Sequence[Any]] = None
+    ) -> "pa.Table":
+        """
+        Execute a SELECT query and return its rows as a columnar Arrow table.
+
+        Rows are fetched as tuples and transposed batch by batch into one list
+        per column, so no per-row dicts are built. Bytes values are decoded to
+        text as in execute_query. Requires the optional pyarrow package.
+
+        Args:
+            query: SELECT query to execute
+            params: Optional values bound to the query placeholders
+
+        Returns:
+            pyarrow.Table with one column per selected column
+
+        Raises:
+            mysql.connector.Error: If the query fails
+        """
+        if pa is None:
+            raise ImportError("execute_query_arrow requires the pyarrow package")
+
+        self.prepare()
+
+        conn = self._get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor(buffered=False, raw=False)
+            cursor.execute(query, params)
+            names = [column[0] for column in cursor.description or []]
+            columns: List[List[Any]] = [[] for _ in names]
+            while True:
+                batch = cursor.fetchmany(self.fetch_size)
+                if not batch:
+                    break
+                for column, values in zip(columns, zip(*batch)):
+                    column.extend(values)
+        finally:
+            if conn.unread_result:
+                conn.consume_results()
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+        for index, column in enumerate(columns):
+            first = next((value for value in column if value is not None), None)
+            if type(first) is bytes or type(first) is bytearray:
+                columns[index] = [
+                    value.decode("utf-8", errors="replace")
+                    if type(value) is bytes or type(value) is bytearray
+                    else value
+                    for value in column
+                ]
+
+        return pa.table([pa.array(column) for column in columns], names=names)
+
+    async def aquery(
+        self, query: str, params: Optional[Sequence[Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute SQL query in a worker thread without blocking the event loop.
+
+        Args:
+            query: SQL query to execute
+            params: Optional values bound to the query placeholders
+
+        Returns:
+            Dictionary with query results and metadata
+        """
+        return await asyncio.to_thread(self.execute_query, query, params)
+
     def close(self) -> None:
-        """Close the database connection."""
-        if self.conn and self.conn.is_connected():
-            self.conn.close()
-            self.conn = None
+        """Close all pooled database connections."""
+        if self.pool is not None:
+            with self._statements_lock:
+                self._statements.clear()
+                self._retired_statements.clear()
+            self.pool._remove_connections()
+            self.pool = None
 
-    def __call__(self, query: str) -> str:
+    def __call__(self, query: str, params: Optional[Sequence[Any]] = None) -> str:
         """
-        Call the tool directly with just the SQL query and return JSON string.
+        Call the tool directly with the SQL query and return JSON string.
 
         Args:
             query: SQL query to execute
+            params: Optional values bound to the query placeholders
 
         Returns:
             JSON string with query results
         """
-        result = self.execute_query(query)
-        return json.dumps(result, default=str, indent=2)
+        result = self.execute_query(query, params)
+        return orjson.dumps(
+            result,
+            default=str,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC,
+        ).decode("utf-8")
 
     def __del__(self):
-        """Ensure connection is closed when object is destroyed."""
+        """Ensure connections are closed when object is destroyed."""
         self.close()
 
 
+class AsyncDatabaseQueryTool:
+    """
+    Asyncio variant of DatabaseQueryTool backed by an aiomysql connection pool.
+
+    Independent queries awaited together (e.g. with asyncio.gather) run on
+    separate pooled connections instead of one after another. Results are not
+    cached. Requires the optional aiomysql package.
+    """
+
+    def __init__(self, minsize: int = 2, maxsize: int = 20):
+        if aiomysql is None:
+            raise ImportError("AsyncDatabaseQueryTool requires the aiomysql package")
+
+        # Get connection params from environment variables (read once)
+        params = _load_params()
+        _check_params(params)
+        self.connection_params = {
+            "db": params["database"],
+            "user": params["user"],
+            "password": params["password"],
+            "host": params["host"],
+            "port": int(params["port"]),
+            # Each statement commits on its own; with autocommit off a read
+            # would leave its transaction open and aiomysql closes such
+            # connections on release instead of reusing them
+            "autocommit": True,
+        }
+
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.fetch_size = int(os.getenv("DB_FETCH_SIZE", "1000"))
+        self.pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def prepare(self) -> None:
+        """Create the connection pool ahead of the first query, if needed."""
+        async with self._pool_lock:
+            if self.pool is not None:
+                return
+            try:
+                self.pool = await aiomysql.create_pool(
+                    minsize=self.minsize,
+                    maxsize=self.maxsize,
+                    **self.connection_params,
+                )
+            except Exception as e:
+                raise ConnectionError(f"Failed to connect to MySQL database: {str(e)}")
+
+    async def execute_query(
+        self, query: str, params: Optional[Sequence[Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute SQL query and return results as JSON.
+
+        Args:
+            query: SQL query to execute, with %s placeholders for params
+            params: Optional values bound to the query placeholders
+
+        Returns:
+            Dictionary with query results and metadata
+        """
+        await self.prepare()
+        is_select = _classify(query) in READ_KINDS
+
+        async with self.pool.acquire() as conn:
+            try:
+                # Reads stream from a server-side cursor instead of buffering
+                cursor_class = (
+                    aiomysql.SSCursor if is_select else aiomysql.Cursor
+                )
+                async with conn.cursor(cursor_class) as cursor:
+                    await cursor.execute(query, params)
+
+                    results_list = []
+                    if is_select:
+                        build = None
+                        while True:
+                            batch = await cursor.fetchmany(self.fetch_size)
+                            if not batch:
+                                break
+                            if build is None:
+                                build = _row_builder(cursor, batch[0])
+                            results_list.extend(build(batch))
+
+                    # Unbuffered cursors only know the row count once read
+                    row_count = len(results_list) if is_select else cursor.rowcount
+                    last_id = cursor.lastrowid
+
+                result = {
+                    "success": True,
+                    "results": results_list,
+                    "row_count": row_count,
+                    "message": f"Query executed successfully. Returned {len(results_list)} rows.",
+                }
+
+                if last_id:
+                    result["last_insert_id"] = last_id
+
+                return result
+
+            except Exception as e:
+                return {
+                    "success": False,
+                    "results": [],
+                    "row_count": 0,
+                    "error": str(e),
+                    "message": f"Query execution failed: {str(e)}",
+                }
+
+    async def close(self) -> None:
+        """Close all pooled database connections."""
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def __call__(
+        self, query: str, params: Optional[Sequence[Any]] = None
+    ) -> str:
+        """
+        Call the tool directly with the SQL query and return JSON string.
+
+        Args:
+            query: SQL query to execute
+            params: Optional values bound to the query placeholders
+
+        Returns:
+            JSON string with query results
+        """
+        result = await self.execute_query(query, params)
+        return orjson.dumps(
+            result,
+            default=str,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC,
+        ).decode("utf-8")
+
+
 # Example usage as an agent tool
 if __name__ == "__main__":
     # Create the tool - it will automatically load from .env file
     db_tool = DatabaseQueryTool()
 
-    # Example query - just pass the query
-    query = "select * from podiscovery.plans"
+    # Example query - project the needed columns and bound the rows
+    query = "SELECT Category, Plans, Description FROM podiscovery.plans LIMIT 100"
 
     # Execute and get JSON result
     result_json = db_tool(query)